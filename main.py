@@ -8,19 +8,59 @@ This project was developed with the help of ChatGPT. The solutions provided by C
 
 Author: Numero7 Mojeangering (Valentin ISOARD)
 """
+import contextlib
+import gc
+import hashlib
 import json
 import os
+import pickle
+import re
+import shutil
+import subprocess
+import sys
 import javalang
 import logging
-from typing import List, Dict, Tuple, Optional
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, ClassVar, Final, FrozenSet, Iterable, Iterator, List, Dict, Sequence, Set, TextIO, Tuple, Optional, cast
 from plantuml import PlantUML
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# javalang instantiates these node classes directly and never subclasses them,
+# so the hot statement loops can dispatch with a cheap `type(node) is` check instead of isinstance.
+# They are Final so a mypyc build keeps them in C statics rather than looking them up in the module dict.
+_StatementExpression: Final = javalang.tree.StatementExpression
+_Assignment: Final = javalang.tree.Assignment
+_ClassCreator: Final = javalang.tree.ClassCreator
+_MethodInvocation: Final = javalang.tree.MethodInvocation
+_LocalVariableDeclaration: Final = javalang.tree.LocalVariableDeclaration
+_ClassDeclaration: Final = javalang.tree.ClassDeclaration
+_InterfaceDeclaration: Final = javalang.tree.InterfaceDeclaration
+_EnumDeclaration: Final = javalang.tree.EnumDeclaration
+# Node classes the class body index is read by, and the nested type declarations are found by
+_FieldDeclaration: Final = javalang.tree.FieldDeclaration
+_MethodDeclaration: Final = javalang.tree.MethodDeclaration
+_ConstructorDeclaration: Final = javalang.tree.ConstructorDeclaration
+_TypeDeclaration: Final = javalang.tree.TypeDeclaration
+_EnumBody: Final = javalang.tree.EnumBody
+# Type node of the primitive types (int, byte, boolean, ...), which are not classes of the diagram
+_BasicType: Final = javalang.tree.BasicType
+# Top-level method statements the relationship extractors look at
+_BODY_STATEMENT_TYPES: Final = (_StatementExpression, _LocalVariableDeclaration)
+# A source without any of these keywords declares no type (e.g. package-info.java, module-info.java), so it is not parsed
+_TYPE_KEYWORD_PATTERN: Final = re.compile(rb"\b(?:class|interface|enum)\b")
+
 class JavaElement:
     """Represents a generic Java element (class, interface, enum, primitive)."""
-    
-    elements: Dict[str, 'JavaElement'] = {}  # Tracks all Java elements by their fully qualified name (FQN)
+    __slots__ = ('name', 'package', 'fqn')
+
+    REGISTER: ClassVar[bool] = True  # Set to False when elements are never looked up with find, so they are not kept alive
+    elements: ClassVar[Dict[str, 'JavaElement']] = {}  # Tracks all Java elements by their fully qualified name (FQN)
+    by_simple_name: ClassVar[Dict[str, List['JavaElement']]] = {}  # Tracks all Java elements by their name, for lookups without a package
 
     def __init__(self, name: str, package: str):
         """
@@ -29,8 +69,14 @@ class JavaElement:
         """
         self.name = name
         self.package = package
-        self.fqn = f"{package}.{name}"  # Fully Qualified Name (FQN)
+        self.fqn = sys.intern(f"{package}.{name}")  # Fully Qualified Name (FQN), interned as it keys the registry
+        if not JavaElement.REGISTER:
+            return
+        replaced = JavaElement.elements.get(self.fqn)
+        if replaced is not None:
+            JavaElement.by_simple_name[replaced.name].remove(replaced)  # A re-registered FQN replaces the previous element in both indexes
         JavaElement.elements[self.fqn] = self  # Register element uniquely
+        JavaElement.by_simple_name.setdefault(name, []).append(self)
 
     @classmethod
     def find(cls, name: str, package: Optional[str] = None) -> Optional['JavaElement']:
@@ -44,8 +90,17 @@ class JavaElement:
             return cls.elements.get(f"{package}.{name}")
         
         # Search for all elements with the given name (without package filtering)
-        matches = [elem for fqn, elem in cls.elements.items() if fqn.endswith(f".{name}")]
-        return matches[0] if len(matches) == 1 else None  # Return element if unique, else None
+        matches = cls.by_simple_name.get(name)
+        return matches[0] if matches and len(matches) == 1 else None  # Return element if unique, else None
+
+    @classmethod
+    def clear_registry(cls) -> None:
+        """
+        Forgets every registered element, so the elements of a finished analysis can be freed
+        before the next project is analysed in the same process.
+        """
+        cls.elements.clear()
+        cls.by_simple_name.clear()
 
     def __str__(self) -> str:
         return f"{self.__class__.__name__}: {self.name}, Package: {self.package}"
@@ -53,6 +108,22 @@ class JavaElement:
 
 class JavaRelation:
     """Represents a relationship between two Java elements."""
+    __slots__ = ('source', 'target', 'relation_type', '_text')
+
+    RELATION_TYPES: ClassVar[Tuple[str, ...]] = ("extends", "implements", "dependency", "association", "aggregation",
+                                                 "composition", "bidirectional", "reflexive", "enum_usage")
+    VALID_RELATION_TYPES: ClassVar[FrozenSet[str]] = frozenset(RELATION_TYPES)  # Built once for the membership tests
+    UML_SYMBOLS: ClassVar[Dict[str, str]] = {
+        "extends": "<|--",
+        "implements": "<|..",
+        "dependency": "..>",
+        "association": "--",
+        "aggregation": "o--",
+        "composition": "*--",
+        "bidirectional": "<-->",
+        "reflexive": "--",
+        "enum_usage": "..|>"
+    }
     
     def __init__(self, source: JavaElement, target: JavaElement, relation_type: str):
         """
@@ -65,32 +136,47 @@ class JavaRelation:
         self.source = source
         self.target = target
         self.relation_type = relation_type
+        self._text: Optional[str] = None  # PlantUML line, built on the first str() call
+
+    @classmethod
+    def create(cls, source: Any, target: Any, relation_type: str) -> Optional['JavaRelation']:
+        """
+        Creates a relation only when both ends are Java elements and the type is known, so invalid relations are never built.
+        :param source: The source Java element.
+        :param target: The target Java element.
+        :param relation_type: The type of relationship, one of RELATION_TYPES.
+        :return: The new JavaRelation, or None if either end is not a JavaElement or the type is unknown.
+        """
+        if relation_type in cls.VALID_RELATION_TYPES and isinstance(source, JavaElement) and isinstance(target, JavaElement):
+            return cls(source, target, relation_type)
+        return None
 
     def __str__(self) -> str:
-        return f"{self.source.fqn} {self._get_uml_symbol()} {self.target.fqn}"
+        # A relation is not modified once created, so its line is only formatted once
+        if self._text is None:
+            self._text = f"{self.source.fqn} {self._get_uml_symbol()} {self.target.fqn}"
+        return self._text
 
     def _get_uml_symbol(self) -> str:
         """Returns the appropriate PlantUML symbol for the relation type."""
-        symbols = {
-            "extends": "<|--",
-            "implements": "<|..",
-            "dependency": "..>",
-            "association": "--",
-            "aggregation": "o--",
-            "composition": "*--",
-            "bidirectional": "<-->",
-            "reflexive": "--",
-            "enum_usage": "..|>"
-        }
-        return symbols.get(self.relation_type, "--")  # Default to simple association
+        return JavaRelation.UML_SYMBOLS.get(self.relation_type, "--")  # Default to simple association
 
     def is_valid(self) -> bool:
         """Checks if the relationship is valid (both source and target exist)."""
         return isinstance(self.source, JavaElement) and isinstance(self.target, JavaElement)
 
 
+# Signature of a method: its visibility symbol, return type name and parameter type names
+MethodSig = namedtuple('MethodSig', 'visibility return_type parameters')
+
+
 class JavaClass:
-    def __init__(self, name: str, package: str, attributes: Dict[str, str], methods: Dict[str, Dict[str, List[str]]],
+    # One instance per class of the project, so the attributes are kept in slots instead of a per-instance dict
+    __slots__ = ('name', 'package', 'attributes', 'methods', 'extends', 'implements', 'associations', 'dependencies',
+                 'aggregations', 'compositions', 'bidirectional_associations', 'reflexive_associations', 'enums',
+                 'external_inheritance')
+
+    def __init__(self, name: str, package: str, attributes: Dict[str, str], methods: Dict[str, MethodSig],
                  extends: Optional[str] = None, implements: Optional[List[str]] = None,
                  associations: Optional[List[str]] = None, dependencies: Optional[List[str]] = None,
                  aggregations: Optional[List[str]] = None, compositions: Optional[List[str]] = None,
@@ -113,7 +199,9 @@ class JavaClass:
 
 class JavaInterface:
     """Represents a Java Interface."""
-    def __init__(self, name: str, package: str, methods: Dict[str, Dict[str, List[str]]]) -> None:
+    __slots__ = ('name', 'package', 'methods')
+
+    def __init__(self, name: str, package: str, methods: Dict[str, MethodSig]) -> None:
         self.name = name  # Interface name
         self.package = package  # Package of the interface
         self.methods = methods  # Dictionary of methods (name, visibility, return type, parameters)
@@ -123,6 +211,8 @@ class JavaInterface:
 
 class JavaEnum:
     """Represents a Java Enum."""
+    __slots__ = ('name', 'package', 'constants')
+
     def __init__(self, name: str, package: str, constants: List[str]) -> None:
         self.name = name  # Enum name
         self.package = package  # Package of the enum
@@ -133,23 +223,28 @@ class JavaEnum:
 
 
 class JavaPackage:
+    __slots__ = ('package_name', 'classes', 'interfaces', 'enums')
+
     def __init__(self, package_name: str):
         self.package_name = package_name
-        self.classes = []
-        self.interfaces = []
-        self.enums = []
+        # Keyed by name for direct lookups, in declaration order
+        self.classes: Dict[str, 'JavaClass'] = {}
+        self.interfaces: Dict[str, 'JavaInterface'] = {}
+        self.enums: Dict[str, 'JavaEnum'] = {}
 
     def add_class(self, java_class: 'JavaClass'):
-        self.classes.append(java_class)
+        self.classes[java_class.name] = java_class
     
     def add_interface(self, java_interface: 'JavaInterface'):
-        self.interfaces.append(java_interface)
+        self.interfaces[java_interface.name] = java_interface
 
     def add_enum(self, java_enum: 'JavaEnum'):
-        self.enums.append(java_enum)
+        self.enums[java_enum.name] = java_enum
 
 class JavaPrimitive:
     """Represents a Java primitive type."""
+    __slots__ = ('name',)
+
     def __init__(self, name: str):
         self.name = name  # The name of the primitive type (e.g., int, double, boolean)
 
@@ -157,620 +252,1019 @@ class JavaPrimitive:
         return f"Primitive: {self.name}"
 
 
-class JavaProjectParser:
-    FILTER_RELATION_SHIPS = True
+# Index of each relationship list inside a Relationships tuple, matching JavaProjectParser.RELATIONSHIP_TYPES
+ASSOCIATION: Final = 0
+DEPENDENCY: Final = 1
+AGGREGATION: Final = 2
+COMPOSITION: Final = 3
+BIDIRECTIONAL_ASSOCIATION: Final = 4
+REFLEXIVE_ASSOCIATION: Final = 5
+ENUM: Final = 6
+EXTERNAL_INHERITANCE: Final = 7
+
+# The eight relationship lists of a class, in the order of JavaProjectParser.RELATIONSHIP_TYPES
+Relationships = Tuple[List[str], List[str], List[str], List[str], List[str], List[str], List[str], List[str]]
+
+# Type details of a field declaration, read once and shared by the relationship extractors
+FieldInfo = namedtuple('FieldInfo', 'type_name arg_names is_array is_primitive has_creator_init')
+
+# Members of a class body sorted by kind, keeping only the body statements the extractors look at
+ClassMembers = namedtuple('ClassMembers', 'fields methods enum_decls method_statements constructor_statements')
+
+
+# Build output, version control and dependency folders, which hold no project sources.
+# They are only skipped directly under the project folder, so source packages with these names (e.g. com.acme.build) are kept
+SKIPPED_DIRECTORIES: Final = frozenset({"target", "build", ".git", "node_modules"})
+
+
+def _iter_java_files(root: str) -> Iterator[os.DirEntry]:
+    """
+    Yields the directory entries of the .java files below a folder, in the same top-down order as os.walk.
+    The entries are returned rather than their paths so their stat can be reused, which comes for free
+    with the directory listing on Windows. Folders named in SKIPPED_DIRECTORIES directly under the root are not entered.
+    :param root: The folder to search.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        subdirectories = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if directory == root and entry.name in SKIPPED_DIRECTORIES:
+                            logging.info(f"Skipping folder {entry.path}")
+                        else:
+                            subdirectories.append(entry.path)
+                    elif entry.name.endswith(".java"):
+                        yield entry
+        except OSError as e:
+            logging.error(f"Failed to list {directory}: {e}")
+        stack.extend(reversed(subdirectories))
+
+
+def _available_cpus() -> int:
+    """Returns the number of CPUs this process may run on, which can be fewer than the machine has (e.g. in a container)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def _intern(name: Optional[str]) -> Optional[str]:
+    """
+    Interns a name read from the AST, or returns it unchanged if there is none.
+    The same class and type names appear many times across a project; interned, they share a single string
+    and the dict and set lookups on them can match by identity.
+    """
+    return sys.intern(name) if name else name
+
+
+def _iter_type_declarations(types: List[javalang.tree.TypeDeclaration]) -> Iterator[javalang.tree.TypeDeclaration]:
+    """
+    Yields type declarations followed by the types nested in their bodies, depth first.
+    Only declarations are visited, never statements or expressions.
+    :param types: The top-level type declarations (e.g. CompilationUnit.types).
+    """
+    for type_decl in types:
+        yield type_decl
+        body = type_decl.body
+        members = body.declarations if isinstance(body, _EnumBody) else body or []
+        yield from _iter_type_declarations([member for member in members if isinstance(member, _TypeDeclaration)])
+
+
+def _load_cached_tree(cache_file: str) -> Optional[javalang.tree.CompilationUnit]:
+    """Loads a previously pickled AST, or returns None if there is no usable cache entry."""
+    try:
+        with open(cache_file, "rb") as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable cache entry {cache_file}: {e}")
+        return None
+
+
+def _store_pickle(cache_file: str, value: Any) -> bool:
+    """
+    Pickles an AST or the manifest to the cache, writing to a temporary file first so readers never see a partial entry.
+    :return: True if the entry was written.
+    """
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, "wb") as file:
+            pickle.dump(value, file, protocol=5)
+        os.replace(temp_file, cache_file)
+        return True
+    except Exception as e:
+        logging.warning(f"Could not write cache entry {cache_file}: {e}")
+        # The temporary file is named after the process, so a leftover one would never be overwritten or pruned
+        with contextlib.suppress(OSError):
+            os.remove(temp_file)
+        return False
+
+
+def _load_manifest(manifest_file: str) -> Dict[str, Tuple[int, int, str]]:
+    """Loads the cache manifest mapping each source file to its (mtime, size, cache entry), or an empty one."""
+    try:
+        with open(manifest_file, "rb") as file:
+            manifest = pickle.load(file)
+        return manifest if isinstance(manifest, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable cache manifest {manifest_file}: {e}")
+        return {}
+
+
+def _prune_cache(cache_folder: str, manifest_file: str, stale_entries: Set[str]) -> None:
+    """
+    Deletes the cache entries a project no longer uses.
+    Entries are keyed by the source content, so projects sharing a cache folder can share an entry (e.g. two checkouts
+    of the same repository): an entry another project's manifest still references is kept.
+    :param cache_folder: The folder holding the pickled ASTs and the manifests.
+    :param manifest_file: The manifest of the project, whose entries are given.
+    :param stale_entries: The paths of the entries the project no longer uses.
+    """
+    if not stale_entries:
+        return
+    stale_names = {os.path.basename(cache_file) for cache_file in stale_entries}
+    try:
+        with os.scandir(cache_folder) as entries:
+            other_manifests = [entry.path for entry in entries if "-manifest-" in entry.name and entry.name.endswith(".pkl")
+                               and entry.name != os.path.basename(manifest_file)]
+    except OSError as e:
+        logging.warning(f"Could not prune cache folder {cache_folder}: {e}")
+        return
+    for other_manifest in other_manifests:
+        # Compared by file name, as another project may have spelled the cache folder path differently
+        stale_names.difference_update(os.path.basename(entry[2]) for entry in _load_manifest(other_manifest).values())
+    for cache_file in stale_entries:
+        if os.path.basename(cache_file) not in stale_names:
+            continue
+        try:
+            os.remove(cache_file)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not remove cache entry {cache_file}: {e}")
+
+
+def _parse_one(file_path: str, cache_folder: Optional[str] = None,
+               return_tree: bool = True) -> Tuple[str, Optional[javalang.tree.CompilationUnit], Optional[str]]:
+    """
+    Parses a single Java source file.
+    Defined at module level so it can be dispatched to worker processes.
+    :param file_path: The path of the Java source file.
+    :param cache_folder: (Optional) Folder holding pickled ASTs keyed by the source content.
+    :param return_tree: When False and the AST is in the cache, only its cache entry is returned, so a worker process
+                        doesn't pickle the tree a second time to send it back. The caller then loads the entry.
+    :return: The file path, its AST or None if the file could not be parsed (or is left in the cache),
+             and the cache entry holding the AST.
+    """
+    try:
+        source = Path(file_path).read_bytes()
+    except OSError as e:
+        # A file deleted, unreadable or locked since the folder was listed is skipped like an unparsable one
+        logging.error(f"Failed to parse {file_path}: {e}")
+        return file_path, None, None
+
+    if not _TYPE_KEYWORD_PATTERN.search(source):
+        return file_path, None, None
+
+    cache_file = None
+    if cache_folder:
+        # The javalang version is part of the name so an upgrade invalidates old entries
+        key = hashlib.blake2b(source, digest_size=16).hexdigest()
+        cache_file = os.path.join(cache_folder, f"javalang-{javalang.__version__}-{key}.pkl")
+        if not return_tree and os.path.isfile(cache_file):
+            return file_path, None, cache_file
+        tree = _load_cached_tree(cache_file)
+        if tree is not None:
+            return file_path, tree, cache_file
+
+    try:
+        # Undecodable bytes (e.g. a Latin-1 comment) are replaced rather than failing the whole file
+        tree = javalang.parse.parse(source.decode("utf-8", errors="replace"))
+    except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError) as e:
+        # Caught here rather than by the caller, as an exception raised in a worker would abort the whole pool
+        logging.error(f"Failed to parse {file_path}: {e}")
+        return file_path, None, None
+
+    if cache_file and _store_pickle(cache_file, tree) and not return_tree:
+        return file_path, None, cache_file
+    return file_path, tree, cache_file
+
 
-    def __init__(self, project_path: str):
+class JavaProjectParser:
+    FILTER_RELATION_SHIPS: ClassVar[bool] = True
+    # Order of the relationship lists returned by _extract_relationships
+    RELATIONSHIP_TYPES: ClassVar[Tuple[str, ...]] = ('association', 'dependency', 'aggregation', 'composition', 'bidirectional_association', 'reflexive_association', 'enum', 'external_inheritance')
+    # PlantUML visibility symbol of each access modifier
+    VISIBILITY_SYMBOLS: ClassVar[Dict[str, str]] = {"public": "+", "private": "-", "protected": "#"}
+    # Relationship types kept first when a mate has several relationships with the same class
+    DEFAULT_PRIORITY_ORDER: ClassVar[Tuple[int, ...]] = (COMPOSITION, AGGREGATION, DEPENDENCY, BIDIRECTIONAL_ASSOCIATION,
+                                                        ASSOCIATION, REFLEXIVE_ASSOCIATION, ENUM, EXTERNAL_INHERITANCE)
+
+    def __init__(self, project_path: str, max_workers: Optional[int] = None, cache_folder: Optional[str] = None):
+        """
+        :param project_path: The root folder of the Java project.
+        :param max_workers: (Optional) Number of processes used to parse files, defaults to the number of CPUs this process may run on.
+        :param cache_folder: (Optional) Folder where parsed ASTs are cached between runs, disabled if not set.
+        """
         self.project_path = project_path
+        self.max_workers = max_workers or _available_cpus()
+        self.cache_folder = cache_folder
         self.classes: Dict[str, 'JavaClass'] = {}
         self.enums: Dict[str, 'JavaEnum'] = {}
         self.interfaces: Dict[str, 'JavaInterface'] = {}
         self.packages: Dict[str, 'JavaPackage'] = {}
+        self._class_names: FrozenSet[str] = frozenset()  # Names of the discovered classes, filled once after discovery for the membership tests
+        self._assoc_index: Dict[str, Set[str]] = {}  # Associations of each class, filled before bidirectional detection
+        self._relationships_index: Dict[str, Relationships] = {}  # Relationships of each class, for bidirectional detection
+        self._body_index: Dict[int, Dict[type, List[Any]]] = {}  # Members of each class body by node type, see _index_body
 
     def parse(self) -> None:
+        # Loading or parsing the ASTs allocates a huge number of nodes that all live until the end of the parse,
+        # so the cyclic garbage collector is paused rather than left to rescan the growing trees over and over
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._parse()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _parse(self) -> None:
+        file_entries = list(_iter_java_files(self.project_path))
+        file_paths = [entry.path for entry in file_entries]
+
+        # Files whose modification time and size match the manifest reuse their cached AST without being read.
+        # They are loaded here, so only the files that really need parsing are sent to the worker processes.
+        manifest: Dict[str, Tuple[int, int, str]] = {}
+        stats: Dict[str, Tuple[int, int]] = {}
+        results: List[Tuple[str, Optional[javalang.tree.CompilationUnit], Optional[str]]] = [(file_path, None, None) for file_path in file_paths]
+        pending = list(range(len(file_paths)))
+        if self.cache_folder:
+            try:
+                os.makedirs(self.cache_folder, exist_ok=True)
+            except OSError as e:
+                # The cache is optional, so the project is still parsed, only without it
+                logging.warning(f"Could not create cache folder {self.cache_folder}, caching is disabled: {e}")
+                self.cache_folder = None
+        if self.cache_folder:
+            # One manifest per project, so several projects can share the cache folder
+            project_key = hashlib.blake2b(os.path.abspath(self.project_path).encode(), digest_size=8).hexdigest()
+            manifest_file = os.path.join(self.cache_folder, f"javalang-{javalang.__version__}-manifest-{project_key}.pkl")
+            manifest = _load_manifest(manifest_file)
+            pending = []
+            for position, (file_path, file_entry) in enumerate(zip(file_paths, file_entries)):
+                try:
+                    stat = file_entry.stat()
+                except OSError:
+                    pending.append(position)
+                    continue
+                stats[file_path] = (stat.st_mtime_ns, stat.st_size)
+                entry = manifest.get(file_path)
+                if entry and entry[:2] == stats[file_path]:
+                    tree = _load_cached_tree(entry[2])
+                    if tree is not None:
+                        results[position] = (file_path, tree, entry[2])
+                        continue
+                pending.append(position)
+        parse_one = partial(_parse_one, cache_folder=self.cache_folder)
+        pending_paths = [file_paths[position] for position in pending]
+
+        # Parse every remaining file once, spread over worker processes, and keep its AST for both passes
+        # No more processes are started than there are files to parse, each one being costly to spawn
+        workers = min(self.max_workers, len(pending_paths))
+        if workers > 1:
+            # With a cache, the workers store the ASTs and only send back their cache entries, so each tree is pickled once
+            parse_in_worker = partial(_parse_one, cache_folder=self.cache_folder, return_tree=not self.cache_folder)
+            parsed = []
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Each file is its own task, so a failure only affects that file rather than the whole parse
+                futures = [executor.submit(parse_in_worker, file_path) for file_path in pending_paths]
+                for file_path, future in zip(pending_paths, futures):
+                    try:
+                        file_path, tree, cache_file = future.result()
+                    except Exception as e:
+                        # e.g. a deeply nested AST that can't be pickled back, or a crashed worker: parsed again here
+                        logging.warning(f"Parsing {file_path} in a worker process failed, parsing it again: {e}")
+                        parsed.append(parse_one(file_path))
+                        continue
+                    if tree is None and cache_file:
+                        tree = _load_cached_tree(cache_file)
+                        # An entry that can't be read back is parsed again here
+                        if tree is None:
+                            parsed.append(parse_one(file_path))
+                            continue
+                    parsed.append((file_path, tree, cache_file))
+        else:
+            parsed = [parse_one(file_path) for file_path in pending_paths]
+        for position, result in zip(pending, parsed):
+            results[position] = result
+        asts = [tree for _, tree, _ in results if tree is not None]
+
+        if self.cache_folder:
+            # Rewritten from this run only, so deleted files drop out of the manifest
+            new_manifest = {file_path: stats[file_path] + (cache_file,) for file_path, _, cache_file in results
+                            if cache_file and file_path in stats}
+            if new_manifest != manifest:
+                _store_pickle(manifest_file, new_manifest)
+                # Entries of changed or deleted files are never looked up again
+                in_use = {cache_file for _, _, cache_file in results if cache_file}
+                _prune_cache(self.cache_folder, manifest_file, {entry[2] for entry in manifest.values()} - in_use)
+
         # Discover classes first
-        for root, _, files in os.walk(self.project_path):
-            for file in files:
-                if file.endswith(".java"):
-                    self._discover_java_class(os.path.join(root, file))
-        
-        # Then extract relationships for the discovered classes
-        for root, _, files in os.walk(self.project_path):
-            for file in files:
-                if file.endswith(".java"):
-                    self._extract_relationships_from_file(os.path.join(root, file))
+        class_nodes: List[Tuple[JavaClass, javalang.tree.ClassDeclaration]] = []
+        for tree in asts:
+            class_nodes.extend(self._discover_java_class(tree))
+        self._class_names = frozenset(self.classes)
+
+        # Then extract relationships for the discovered classes, straight from their declaration nodes
+        extracted: List[Tuple[JavaClass, Dict[Optional[str], None], Relationships]] = []
+        for java_class, node in class_nodes:
+            candidates: Dict[Optional[str], None] = {}
+            extracted.append((java_class, candidates, self._extract_relationships(node, self._bucket_members(node), candidates)))
+
+        # Bidirectional associations need the associations of every class, so they are resolved once all are known
+        self._assoc_index = {java_class.name: set(relationships[ASSOCIATION]) for java_class, _, relationships in extracted}
+        # A class no other class associates with can't be part of a bidirectional association, so its members are not checked
+        associated_names = set(chain.from_iterable(self._assoc_index.values()))
+        self._relationships_index = {java_class.name: relationships for java_class, _, relationships in extracted}
+        for java_class, candidates, relationships in extracted:
+            if java_class.name in associated_names:
+                self._extract_bidirectional_associations(java_class.name, candidates, relationships)
+
+        # Relationships are only limited once every pair has been recorded, as recording one changes the peer's associations
+        for java_class, _, relationships in extracted:
+            if JavaProjectParser.FILTER_RELATION_SHIPS:
+                relationships = self.limit_relationships(relationships)
+            (java_class.associations, java_class.dependencies, java_class.aggregations, 
+             java_class.compositions, java_class.bidirectional_associations, 
+             java_class.reflexive_associations, java_class.enums, 
+             java_class.external_inheritance) = relationships
+
+        # The index is keyed by node ids, which are only meaningful while the ASTs are alive
+        self._body_index.clear()
+
+    def _discover_java_class(self, tree: javalang.tree.CompilationUnit) -> List[Tuple['JavaClass', javalang.tree.ClassDeclaration]]:
+        """
+        Registers the classes, interfaces and enums declared in a tree.
+        :return: Each discovered class with its declaration node, so relationships can be extracted without walking the tree again.
+        """
+        package_name = self._extract_package(tree)
+        # Create or get the package
+        java_package = self.packages.get(package_name)
+        if java_package is None:
+            java_package = self.packages[package_name] = JavaPackage(package_name)
+
+        class_nodes = []
+
+        for node in _iter_type_declarations(tree.types):
+            node_type = type(node)
+            # Check for interface declarations
+            if node_type is _InterfaceDeclaration:
+                _, methods = self._extract_members(node)
+                java_interface = JavaInterface(sys.intern(node.name), package_name, methods)
+
+                # Add the interface to the package
+                java_package.add_interface(java_interface)
+                # Store the interface in the main interface dictionary
+                self.interfaces[java_interface.name] = java_interface
+
+            elif node_type is _ClassDeclaration:
+                attributes, methods = self._extract_members(node)
+                extends = self._extract_extends(node)
+                implements = self._extract_implements(node)
+                java_class = JavaClass(sys.intern(node.name), package_name, attributes, methods, extends, implements)
+
+                # Add the class to the package
+                java_package.add_class(java_class)
+                # Store the class in the main class dictionary
+                self.classes[java_class.name] = java_class
+                class_nodes.append((java_class, node))
+
+            # Check for enum declarations
+            elif node_type is _EnumDeclaration:
+                java_enum = JavaEnum(sys.intern(node.name), package_name, [constant.name for constant in node.body.constants])
+
+                # Add the enum to the package
+                java_package.add_enum(java_enum)
+                # Store the enum in the main enum dictionary
+                self.enums[java_enum.name] = java_enum
+
+        return class_nodes
+
+    def _bucket_members(self, class_node: javalang.tree.ClassDeclaration) -> ClassMembers:
+        """
+        Sorts the class members by kind once so each extractor only visits what it needs.
+        Only the top-level statements the extractors look at are kept from method and constructor bodies,
+        so bodies without any of them are never walked again.
+        """
+        index = self._index_body(class_node)
+        fields: List[FieldInfo] = [self._get_field_info(member) for member in index.get(_FieldDeclaration, ())]
+        # The extractors only read these lists, so the ones of the body index are shared rather than copied
+        methods: List[javalang.tree.MethodDeclaration] = index.get(_MethodDeclaration, [])
+        enum_decls: List[javalang.tree.EnumDeclaration] = index.get(_EnumDeclaration, [])
+        method_statements: List[javalang.tree.Statement] = []
+        constructor_statements: List[javalang.tree.StatementExpression] = []
+        for member in methods:
+            body = member.body
+            if not body:
+                continue  # Abstract and native methods have no body
+            method_statements.extend(statement for statement in body if type(statement) in _BODY_STATEMENT_TYPES)
+        for member in index.get(_ConstructorDeclaration, ()):
+            constructor_statements.extend(statement for statement in member.body
+                                          if type(statement) is _StatementExpression)
+        return ClassMembers(fields, methods, enum_decls, method_statements, constructor_statements)
+
+    def _extract_relationships(self, class_node: javalang.tree.ClassDeclaration, members: ClassMembers,
+                               bidirectional_candidates: Dict[Optional[str], None]) -> Relationships:
+        """
+        Extracts the relationships of a class, leaving the bidirectional associations empty.
+        Each kind of member is visited once and fills every relationship list it contributes to.
+        :param bidirectional_candidates: Filled in the same pass with the classes referenced by the fields, by object creation
+                                         or by a method invocation, to be checked once the associations of every class are known.
+        """
+        # Mates are collected as the keys of insertion-ordered dicts, used as ordered sets:
+        # only the first occurrence of a mate is kept, in the order it was found, without any membership test
+        associations: Dict[str, None] = {}
+        dependencies: Dict[str, None] = {}
+        aggregations: Dict[str, None] = {}
+        compositions: Dict[str, None] = {}
+        bidirectional_associations: List[str] = []
+        reflexive_associations: Dict[str, None] = {}
+        enums: Dict[str, None] = {}
+        external_inheritance: List[str] = []
+
+        # Names read from the declarations and statements below are interned like the field types,
+        # so equal names across the project are the same string
+        class_name = sys.intern(class_node.name)
+        class_names = self._class_names
+        fields, methods, enum_decls, method_statements, constructor_statements = members
+
+        # Fields
+        for field in fields:
+            field_type = field.type_name
+            bidirectional_candidates[field_type] = None
+            if not field_type:
+                continue
+            arg_names = field.arg_names
+            # Most fields hold a primitive (or an array of primitives), a String or another plain library type,
+            # which none of the checks below can match, so they are skipped up front
+            if field.is_primitive or not (arg_names or field.is_array or field.has_creator_init
+                                          or field_type in class_names or field_type.isupper()):
+                continue
+
+            # Aggregations: the type arguments of collections (e.g., List<Something>, Set<Something>, Map<K, V>)
+            for inner_type in arg_names:
+                if inner_type:
+                    aggregations[inner_type] = None
+            # Array types (e.g., MyClass[] or SomeType[][]): javalang keeps the element type name and the dimensions apart.
+            # Primitive arrays (e.g., int[]) were skipped above, so the element type is a reference type
+            if field.is_array:
+                aggregations[field_type] = None
+
+            # Compositions: the field is initialized with a new object
+            if field.has_creator_init:
+                compositions[field_type] = None
+
+            # Enums (uppercase field type is a heuristic, but could be improved)
+            if field_type.isupper():
+                enums[field_type] = None
+
+            if field_type.strip():
+                # Direct association to another class (excluding the class itself)
+                if field_type in class_names and field_type != class_name:
+                    associations[field_type] = None
+                # Generic types (collections or parameterized types) whose inner type is a class
+                for inner_type in arg_names:
+                    if inner_type in class_names and inner_type != class_name:
+                        associations[inner_type] = None
+
+            # Reflexive association (the field type is the class itself)
+            if field_type == class_name:
+                reflexive_associations[field_type] = None
+
+        # Enums declared within the class itself
+        for member in enum_decls:
+            enums[sys.intern(member.name)] = None
+
+        # Constructors: object creation assigned to a field
+        for statement in constructor_statements:
+            expression = statement.expression
+            if type(expression) is _Assignment:
+                value = expression.value
+                if type(value) is _ClassCreator:
+                    field_type = _intern(value.type.name)
+                    bidirectional_candidates[field_type] = None
+                    if field_type:
+                        compositions[field_type] = None
+                        if field_type in class_names and field_type != class_name:
+                            associations[field_type] = None
+
+        # Methods: parameters and return types referencing another class or the class itself
+        for member in methods:
+            if getattr(member.return_type, 'name', None) == class_name:
+                reflexive_associations[class_name] = None
+            for parameter in member.parameters:
+                param_type = _intern(getattr(parameter.type, 'name', None))
+                if param_type == class_name:
+                    reflexive_associations[class_name] = None
+                elif param_type and param_type in class_names:
+                    associations[param_type] = None
+
+        # Method bodies: object creation and invocations on other objects
+        for statement in method_statements:
+            if type(statement) is _StatementExpression:
+                expression = statement.expression
+                expression_type = type(expression)
+                if expression_type is _Assignment:
+                    value = expression.value
+                    if type(value) is _ClassCreator:
+                        created_type = _intern(value.type.name)
+                        bidirectional_candidates[created_type] = None
+                        if created_type:
+                            compositions[created_type] = None
+                elif expression_type is _ClassCreator:
+                    # Direct object creation
+                    created_type = _intern(expression.type.name)
+                    if created_type:
+                        compositions[created_type] = None
+                elif expression_type is _MethodInvocation:
+                    # Qualifier refers to the object or class being invoked (e.g., "field.run()", "Helper.run()"),
+                    # as the name javalang read. It isn't drawn as a dependency, only checked for a bidirectional association
+                    qualifier = expression.qualifier
+                    if qualifier:
+                        bidirectional_candidates[qualifier] = None
+
+            # Local variables initialized with a new object are dependencies
+            elif type(statement) is _LocalVariableDeclaration:
+                for declarator in statement.declarators:
+                    initializer = declarator.initializer
+                    if type(initializer) is _ClassCreator:
+                        initializer_type = _intern(getattr(initializer.type, 'name', None))
+                        if initializer_type and initializer_type != class_name:
+                            dependencies[initializer_type] = None
 
-    def _discover_java_class(self, file_path: str) -> None:
-        try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                tree = javalang.parse.parse(file.read())
-                package_name = self._extract_package(tree)
-                # Create or get the package
-                if package_name not in self.packages:
-                    self.packages[package_name] = JavaPackage(package_name)
-                
-                for _, node in tree:
-                    # Check for interface declarations
-                    if isinstance(node, javalang.tree.InterfaceDeclaration):
-                        _, methods = self._extract_members(node)
-                        java_interface = JavaInterface(node.name, package_name, methods)
-
-                        # Add the interface to the package
-                        self.packages[package_name].add_interface(java_interface)
-                        # Store the interface in the main interface dictionary
-                        self.interfaces[java_interface.name] = java_interface
-                    
-                    if isinstance(node, javalang.tree.ClassDeclaration):
-                        attributes, methods = self._extract_members(node)
-                        extends = self._extract_extends(node)
-                        implements = self._extract_implements(node)
-                        java_class = JavaClass(node.name, package_name, attributes, methods, extends, implements)
-
-                        # Add the class to the package
-                        self.packages[package_name].add_class(java_class)
-                        # Store the class in the main class dictionary
-                        self.classes[java_class.name] = java_class
-                    
-                    # Check for enum declarations
-                    if isinstance(node, javalang.tree.EnumDeclaration):
-                        java_enum = JavaEnum(node.name, package_name, node.body.constants)
-
-                        # Add the enum to the package
-                        self.packages[package_name].add_enum(java_enum)
-                        # Store the enum in the main enum dictionary
-                        self.enums[java_enum.name] = java_enum
-
-        except (javalang.parser.JavaSyntaxError, FileNotFoundError) as e:
-            logging.error(f"Failed to parse {file_path}: {e}")
-
-    def _extract_relationships_from_file(self, file_path: str) -> None:
-        try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                tree = javalang.parse.parse(file.read())
-                for _, node in tree:
-                    if isinstance(node, javalang.tree.ClassDeclaration) and node.name in self.classes:
-                        java_class = self.classes[node.name]
-                        (java_class.associations, java_class.dependencies, java_class.aggregations, 
-                         java_class.compositions, java_class.bidirectional_associations, 
-                         java_class.reflexive_associations, java_class.enums, 
-                         java_class.external_inheritance) = self._extract_relationships(node)
-        except (javalang.parser.JavaSyntaxError, FileNotFoundError) as e:
-            logging.error(f"Failed to parse {file_path}: {e}")
-
-    def _extract_relationships(self, class_node: javalang.tree.ClassDeclaration) -> Tuple[List[str], List[str], List[str], List[str], List[str], List[str], List[str], List[str]]:
-        associations, dependencies, aggregations, compositions, bidirectional_associations, reflexive_associations, enums, external_inheritance = [], [], [], [], [], [], [], []
-        
-        self._extract_aggregations(class_node, aggregations)
-        self._extract_compositions(class_node, compositions)
-        self._extract_dependencies(class_node, dependencies)
         self._extract_inheritance_relationships(class_node, external_inheritance)
-        self._extract_enums(class_node, enums)
-        self._extract_associations(class_node, associations)
-        self._extract_reflexive_associations(class_node, reflexive_associations)
-        self._extract_bidirectional_associations(class_node, associations, bidirectional_associations)
-        
-        if JavaProjectParser.FILTER_RELATION_SHIPS:
-            return self.limit_relationships((associations, dependencies, aggregations, compositions, bidirectional_associations, reflexive_associations, enums, external_inheritance))
-        else:
-            return associations, dependencies, aggregations, compositions, bidirectional_associations, reflexive_associations, enums, external_inheritance
 
-    def limit_relationships(self, relationships: Tuple[List[str], List[str], List[str], List[str], List[str], List[str], List[str], List[str]], 
+        return (list(associations), list(dependencies), list(aggregations), list(compositions), bidirectional_associations,
+                list(reflexive_associations), list(enums), external_inheritance)
+
+    def limit_relationships(self, relationships: Relationships, 
                         max_relations_per_mate: int = 1, 
-                        priority_order: List[str] = None) -> Tuple[List[str], List[str], List[str], List[str], List[str], List[str], List[str], List[str]]:
+                        priority_order: Optional[Sequence[int]] = None) -> Relationships:
         """
         Limit the number of relationships based on priority order.
         Select only a certain number of relationships for each type and respects the priority order.
+        :param priority_order: Relationship type indexes (ASSOCIATION, COMPOSITION, ...) from the highest priority to the lowest.
         """
         if priority_order is None:
-            priority_order = ['composition', 'aggregation', 'dependency', 'bidirectional_association', 'association', 'reflexive_association', 'enum', 'external_inheritance']
-        
-        # Unpack the provided relationships tuple
-        associations, dependencies, aggregations, compositions, bidirectional_associations, reflexive_associations, enums, external_inheritance = relationships
-
-        # Store relationships for each type in a dictionary for easier access
-        relationships_dict = {
-            'association': associations,
-            'dependency': dependencies,
-            'aggregation': aggregations,
-            'composition': compositions,
-            'bidirectional_association': bidirectional_associations,
-            'reflexive_association': reflexive_associations,
-            'enum': enums,
-            'external_inheritance': external_inheritance
-        }
-
-        # Prepare a dictionary to store selected relationships
-        selected_relationships = {
-            'association': [],
-            'dependency': [],
-            'aggregation': [],
-            'composition': [],
-            'bidirectional_association': [],
-            'reflexive_association': [],
-            'enum': [],
-            'external_inheritance': []
-        }
-
-        # This dictionary will track how many relationships each mate has across all types
-        mate_relationship_count = {}
-
-        # Process each relationship type in priority order
-        for relation_type in priority_order:
-            # Get the relationship list for this type
-            relation_list = relationships_dict[relation_type]
-            
-            # Process each relationship for this type
-            for relationship in relation_list:
-                mate_class = relationship  # The class related to the current class
-                
-                if mate_class not in mate_relationship_count:
-                    mate_relationship_count[mate_class] = 0  # Initialize count if not already set
-
-                # If the mate still has space for more relationships, and it has not yet reached the max limit
-                if mate_relationship_count[mate_class] < max_relations_per_mate:
-                    selected_relationships[relation_type].append(relationship)
-                    mate_relationship_count[mate_class] += 1  # Increase the count for this mate
-
-        # Unpack the selected relationships into the return tuple
-        return (
-            selected_relationships['association'],
-            selected_relationships['dependency'],
-            selected_relationships['aggregation'],
-            selected_relationships['composition'],
-            selected_relationships['bidirectional_association'],
-            selected_relationships['reflexive_association'],
-            selected_relationships['enum'],
-            selected_relationships['external_inheritance']
+            # The default order covers every type, so when no mate appears twice nothing would be dropped
+            if max_relations_per_mate >= 1 and len(set(chain.from_iterable(relationships))) == sum(len(mates) for mates in relationships):
+                return relationships
+            priority_order = JavaProjectParser.DEFAULT_PRIORITY_ORDER
+
+        selected_relationships: List[List[Any]] = [[] for _ in relationships]
+
+        if max_relations_per_mate == 1:
+            # Each mate can only be kept once, so a set of already seen mates is enough
+            seen: Set[Any] = set()
+            for index in priority_order:
+                selected = selected_relationships[index]
+                for mate in relationships[index]:
+                    if mate not in seen:
+                        seen.add(mate)
+                        selected.append(mate)
+        else:
+            # Track how many relationships each mate has across all types
+            mate_relationship_count: Dict[Any, int] = defaultdict(int)
+            for index in priority_order:
+                selected = selected_relationships[index]
+                for mate in relationships[index]:
+                    if mate_relationship_count[mate] < max_relations_per_mate:
+                        selected.append(mate)
+                        mate_relationship_count[mate] += 1
+
+        return cast(Relationships, tuple(selected_relationships))
+
+    def _get_field_info(self, field_decl: javalang.tree.FieldDeclaration) -> FieldInfo:
+        """Reads the type name, generic argument names, array and primitive flags and initializer kind of a field."""
+        field_type = field_decl.type
+        arguments = getattr(field_type, 'arguments', None) or ()
+        return FieldInfo(
+            type_name=_intern(getattr(field_type, 'name', None)),
+            # Wildcards (e.g., List<?>) have no type
+            arg_names=tuple(_intern(getattr(argument.type, 'name', None)) for argument in arguments),
+            is_array=bool(getattr(field_type, 'dimensions', None)),
+            is_primitive=type(field_type) is _BasicType,
+            has_creator_init=any(type(declarator.initializer) is _ClassCreator for declarator in field_decl.declarators)
         )
 
     def _extract_package(self, tree: javalang.tree.CompilationUnit) -> str:
-        for _, node in tree:
-            if isinstance(node, javalang.tree.PackageDeclaration):
-                return node.name
-        return "default"
-
-    def _extract_members(self, class_node: javalang.tree.ClassDeclaration) -> Tuple[Dict[str, str], Dict[str, Dict[str, List[str]]]]:
-        attributes = {declarator.name: self._get_field_type(member) for member in class_node.body
-                      if isinstance(member, javalang.tree.FieldDeclaration)
-                      for declarator in member.declarators}
+        # The package declaration can only be at the root of the compilation unit
+        return sys.intern(tree.package.name) if tree.package else "default"
+
+    def _index_body(self, class_node: javalang.tree.TypeDeclaration) -> Dict[type, List[Any]]:
+        """
+        Groups the members of a class body by node type in a single pass.
+        The index is reused by class discovery and relationship extraction until the end of the parse.
+        """
+        key = id(class_node)
+        index = self._body_index.get(key)
+        if index is None:
+            index = defaultdict(list)
+            for member in class_node.body:
+                index[type(member)].append(member)
+            self._body_index[key] = index
+        return index
+
+    def _extract_members(self, class_node: javalang.tree.ClassDeclaration) -> Tuple[Dict[str, str], Dict[str, MethodSig]]:
+        index = self._index_body(class_node)
+        attributes: Dict[str, str] = {}
+        for member in index.get(_FieldDeclaration, ()):
+            field_type = self._get_field_type(member)  # Shared by every variable of the declaration (e.g., "int x, y;")
+            for declarator in member.declarators:
+                attributes[sys.intern(declarator.name)] = field_type
         
-        methods = {member.name: self._get_method_signature(member) for member in class_node.body 
-                   if isinstance(member, javalang.tree.MethodDeclaration)}
+        methods = {sys.intern(member.name): self._get_method_signature(member) for member in index.get(_MethodDeclaration, ())}
         
         return attributes, methods
 
     def _get_field_type(self, field_decl: javalang.tree.FieldDeclaration) -> str:
         """Extracts the type of the field and visibility (public, private, protected)."""
         visibility = self._get_visibility_from_modifiers(field_decl.modifiers)
-        field_type = field_decl.type.name if hasattr(field_decl.type, 'name') else "Unknown"
+        field_type = getattr(field_decl.type, 'name', "Unknown")
         return f"{visibility} {field_type}"
 
-    def _get_method_signature(self, method_node: javalang.tree.MethodDeclaration) -> Dict[str, List[str]]:
+    def _get_method_signature(self, method_node: javalang.tree.MethodDeclaration) -> MethodSig:
         """Extracts the method signature, return type, parameters, and visibility."""
         visibility = self._get_visibility_from_modifiers(method_node.modifiers)
-        return_type = method_node.return_type.name if hasattr(method_node.return_type, 'name') else "void"
-        parameters = [param.type.name if hasattr(param.type, 'name') else "Unknown" for param in method_node.parameters]
-        return {
-            "visibility": visibility,
-            "return_type": return_type,
-            "parameters": parameters
-        }
+        return_type = sys.intern(getattr(method_node.return_type, 'name', "void"))
+        parameters = tuple(sys.intern(getattr(param.type, 'name', "Unknown")) for param in method_node.parameters)
+        return MethodSig(visibility, return_type, parameters)
     
-    def _get_visibility_from_modifiers(self, modifiers: List[str]) -> str:
+    def _get_visibility_from_modifiers(self, modifiers: Set[str]) -> str:
         """Extracts visibility from method or field modifiers."""
-        if "public" in modifiers:
-            return "+"
-        elif "private" in modifiers:
-            return "-"
-        elif "protected" in modifiers:
-            return "#"
-        else:
-            return "~"
+        # A Java member has at most one access modifier, so the first match is the visibility
+        if modifiers:
+            symbols = JavaProjectParser.VISIBILITY_SYMBOLS
+            for modifier in modifiers:
+                visibility = symbols.get(modifier)
+                if visibility:
+                    return visibility
+        return "~"  # Package-private
 
     def _extract_extends(self, class_node: javalang.tree.ClassDeclaration) -> Optional[str]:
         """ Extracts the parent class the current class extends. """
         if class_node.extends:
-            return class_node.extends.name
+            return sys.intern(class_node.extends.name)
         return None
 
     def _extract_implements(self, class_node: javalang.tree.ClassDeclaration) -> List[str]:
         """ Extracts the interfaces the class implements. """
-        return [iface.name for iface in class_node.implements] if class_node.implements else []
-
-    def _extract_field_relationships(self, class_node: javalang.tree.ClassDeclaration, associations: List[str], aggregations: List[str], compositions: List[str], reflexive_associations: List[str], enums: List[str]) -> None:
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.FieldDeclaration):
-                field_type = member.type.name if hasattr(member.type, 'name') else None
-
-                if field_type and field_type.strip():
-                    # Handle generic collections (e.g., List<SomeType>)
-                    if hasattr(member.type, 'arguments') and member.type.arguments:
-                        for argument in member.type.arguments:
-                            inner_type = argument.type.name if hasattr(argument.type, 'name') else None
-                            if inner_type in self.classes:
-                                associations.append(inner_type)  # Add inner types as associations
-                            if inner_type:
-                                aggregations.append(inner_type)  # Track aggregations as well
-
-                    # Check for direct class references (associations)
-                    if field_type in self.classes:
-                        associations.append(field_type)
-
-                    # Check for compositions if the field is created using an initializer expression
-                    for declarator in member.declarators:
-                        if declarator.initializer and isinstance(declarator.initializer, javalang.tree.ClassCreator):
-                            compositions.append(field_type)
-
-                    # Reflexive association (class referencing itself)
-                    if field_type == class_node.name:
-                        reflexive_associations.append(field_type)
-
-                    # Check for enums (uppercase field type is a heuristic, but could be improved)
-                    if field_type and field_type.isupper():  # Better to explicitly check if field is an enum
-                        enums.append(field_type)
-
-    def _extract_constructor_relationships(self, class_node: javalang.tree.ClassDeclaration, compositions: List[str]) -> None:
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.ConstructorDeclaration):
-                for statement in member.body:
-                    if isinstance(statement, javalang.tree.StatementExpression) and isinstance(statement.expression, javalang.tree.Assignment):
-                        value = statement.expression.value
-                        if isinstance(value, javalang.tree.ClassCreator):
-                            field_type = value.type.name
-                            compositions.append(field_type)  # Track compositions
-
-    def _extract_reflexive_associations(self, class_node: javalang.tree.ClassDeclaration, reflexive_associations: List[str]) -> None:
-        # Check field declarations
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.FieldDeclaration):
-                field_type = member.type.name if hasattr(member.type, 'name') else None
-                
-                # Check if the field's type is the same as the class's name
-                if field_type == class_node.name:
-                    reflexive_associations.append(field_type)
-        
-        # Check method declarations for parameters or return types that are the same as the class's name
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.MethodDeclaration):
-                # Check return type
-                return_type = member.return_type.name if hasattr(member.return_type, 'name') else None
-                if return_type == class_node.name:
-                    reflexive_associations.append(class_node.name)
-                
-                # Check method parameters
-                for param in member.parameters:
-                    param_type = param.type.name if hasattr(param.type, 'name') else None
-                    if param_type == class_node.name:
-                        reflexive_associations.append(class_node.name)
-
-
-    def _extract_compositions(self, class_node: javalang.tree.ClassDeclaration, compositions: List[str]) -> None:
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.FieldDeclaration):
-                # Iterate through all field declarators
-                for declarator in member.declarators:
-                    if declarator.initializer and isinstance(declarator.initializer, javalang.tree.ClassCreator):
-                        # Check if the field is being initialized with a new object
-                        field_type = member.type.name if hasattr(member.type, 'name') else None
-                        if field_type:
-                            compositions.append(field_type)  # Track object creation for compositions
-
-            # Check constructor methods (ConstructorDeclaration in javalang)
-            if isinstance(member, javalang.tree.ConstructorDeclaration):
-                # Iterate through the constructor's body to find object creation
-                for statement in member.body:
-                    if isinstance(statement, javalang.tree.StatementExpression) and isinstance(statement.expression, javalang.tree.Assignment):
-                        # Check for assignments where the right-hand side is a ClassCreator (object creation)
-                        value = statement.expression.value
-                        if isinstance(value, javalang.tree.ClassCreator):
-                            # Get the type of the created object (e.g., ArrayList)
-                            field_type = value.type.name
-                            if field_type:
-                                compositions.append(field_type)  # Track object creation for compositions
-            
-            # Method declarations (look for object creation inside methods)
-            if isinstance(member, javalang.tree.MethodDeclaration):
-                if member.body:  # Ensure body exists and is iterable
-                    for statement in member.body:
-                        # Look for assignment statements in method body
-                        if isinstance(statement, javalang.tree.StatementExpression) and isinstance(statement.expression, javalang.tree.Assignment):
-                            value = statement.expression.value
-                            if isinstance(value, javalang.tree.ClassCreator):
-                                field_type = value.type.name
-                                if field_type:
-                                    compositions.append(field_type)  # Track object creation for compositions
-
-                        # Check for direct object creation in method body
-                        if isinstance(statement, javalang.tree.StatementExpression) and isinstance(statement.expression, javalang.tree.ClassCreator):
-                            field_type = statement.expression.type.name
-                            if field_type:
-                                compositions.append(field_type)  # Track direct object creation for compositions
+        return [sys.intern(iface.name) for iface in class_node.implements] if class_node.implements else []
 
     def _extract_inheritance_relationships(self, class_node: javalang.tree.ClassDeclaration, external_inheritance: List[str]) -> None:
-        if class_node.extends:
-            external_inheritance.append(class_node.extends.name)
+        extends = class_node.extends
+        if extends:
+            external_inheritance.append(sys.intern(extends.name))
     
-    def _extract_enums(self, class_node: javalang.tree.ClassDeclaration, enums: List[str]) -> None:
-        # Check all field declarations in the class
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.FieldDeclaration):
-                # Get the field type
-                field_type = member.type.name if hasattr(member.type, 'name') else None
-                
-                # Check if the field is an enum type
-                if field_type and field_type.isupper():
-                    enums.append(field_type)
-            
-            # Check for enum declaration within the class itself
-            if isinstance(member, javalang.tree.EnumDeclaration):
-                enums.append(member.name)
-
-    def _extract_associations(self, class_node: javalang.tree.ClassDeclaration, associations: List[str]) -> None:
-        # Iterate over all fields to check for associations
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.FieldDeclaration):
-                # Retrieve the field's type
-                field_type = member.type.name if hasattr(member.type, 'name') else None
-                if field_type and field_type.strip():
-                    # 1. Direct association to another class (excluding the class itself)
-                    if field_type in self.classes and field_type != class_node.name:
-                        associations.append(field_type)
-
-                    # 2. Handle generic types (collections or parameterized types)
-                    if hasattr(member.type, 'arguments') and member.type.arguments:
-                        for argument in member.type.arguments:
-                            # Extract the inner type of the generic
-                            inner_type = argument.type.name
-                            # Ensure the inner type is a valid class reference
-                            if inner_type in self.classes:
-                                associations.append(inner_type)
-
-                    # 3. If the field type is a collection or array of another class
-                    elif hasattr(member.type, 'dimensions') and member.type.dimensions:
-                        # Check for arrays (e.g., String[] or SomeClass[])
-                        array_type = member.type.name
-                        if array_type in self.classes and array_type != class_node.name:
-                            associations.append(array_type)
-
-                    # 4. Handle intersection types or multiple associations
-                    if hasattr(member.type, 'type'):
-                        if member.type.type.name != field_type and member.type.type.name in self.classes:
-                            associations.append(member.type.type.name)
-
-        # Ensure no duplicate associations are added
-        associations[:] = list(set(associations))
-
-
-        # Check constructor methods (ConstructorDeclaration in javalang)
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.ConstructorDeclaration):
-                # Check the body for object creation (ClassCreator)
-                for statement in member.body:
-                    if isinstance(statement, javalang.tree.StatementExpression) and isinstance(statement.expression, javalang.tree.Assignment):
-                        value = statement.expression.value
-                        if isinstance(value, javalang.tree.ClassCreator):
-                            field_type = value.type.name
-                            if field_type in self.classes and field_type != class_node.name:
-                                associations.append(field_type)
-
-        # Check method parameters (MethodDeclaration)
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.MethodDeclaration):
-                for parameter in member.parameters:
-                    param_type = parameter.type.name if hasattr(parameter.type, 'name') else None
-                    if param_type and param_type != class_node.name:
-                        # If the parameter is a reference to another class, it's an association
-                        if param_type in self.classes:
-                            associations.append(param_type)
-
-    def _extract_aggregations(self, class_node: javalang.tree.ClassDeclaration, aggregations: List[str]) -> None:
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.FieldDeclaration):
-                # Get the field type (not the name)
-                field_type = member.type.name if hasattr(member.type, 'name') else None
-                
-                if field_type:
-                    # Check if the field is a collection or array (e.g., List<Something>, Set<Something>, Map<K, V>)
-                    if hasattr(member.type, 'arguments') and member.type.arguments:
-                        # The type arguments represent the inner types of collections (e.g., List<String>)
-                        for argument in member.type.arguments:
-                            inner_type = argument.type.name
-                            if inner_type:
-                                aggregations.append(inner_type)
-                    # Check for array types (e.g., MyClass[] or SomeType[])
-                    if field_type.endswith("[]"):
-                        array_type = field_type[:-2]  # Remove the "[]" part
-                        aggregations.append(array_type)
-
-    def _extract_dependencies(self, class_node: javalang.tree.ClassDeclaration, dependencies: List[str]) -> None:
-        # Check method declarations for dependencies via method invocations
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.MethodDeclaration):
-                for statement in member.body or []:
-                    # Check if the statement is a method invocation with a qualifier (i.e., an object is invoking the method)
-                    if isinstance(statement, javalang.tree.StatementExpression) and isinstance(statement.expression, javalang.tree.MethodInvocation):
-                        method_invocation = statement.expression
-                        if method_invocation.qualifier:  # Qualifier refers to the object or class being invoked
-                            qualifier = method_invocation.qualifier
-                            qualifier_type = qualifier.type.name if hasattr(qualifier, 'type') else None
-                            if qualifier_type and qualifier_type != class_node.name:
-                                dependencies.append(qualifier_type)
-
-                    # Check for local variable declarations and the object creation (ClassCreator) inside them
-                    if isinstance(statement, javalang.tree.LocalVariableDeclaration):
-                        for declarator in statement.declarators:
-                            if isinstance(declarator.initializer, javalang.tree.ClassCreator):
-                                # Track the dependencies as the class instance is created
-                                initializer_type = declarator.initializer.type.name if hasattr(declarator.initializer.type, 'name') else None
-                                if initializer_type and initializer_type != class_node.name:
-                                    dependencies.append(initializer_type)
-
-    def _extract_bidirectional_associations(self, class_node: javalang.tree.ClassDeclaration, associations: List[str], bidirectional_associations: List[str]) -> None:
-        # Iterate over all fields to check for associations
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.FieldDeclaration):
-                field_type = member.type.name if hasattr(member.type, 'name') else None
-                if field_type and field_type.strip():
-                    # Check if the field type is an association with another class
-                    if field_type in self.classes and field_type != class_node.name:
-                        # If the associated class also has a reference to this class, it's bidirectional
-                        associated_class = self.classes[field_type]
-                        if class_node.name in associated_class.associations:
-                            # Add both classes to the bidirectional associations
-                            if (field_type, class_node.name) not in bidirectional_associations:
-                                bidirectional_associations.append((class_node.name, field_type))
-
-        # Check for bidirectional relationships in constructors (object creation involving two related classes)
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.ConstructorDeclaration):
-                for statement in member.body:
-                    if isinstance(statement, javalang.tree.StatementExpression) and isinstance(statement.expression, javalang.tree.Assignment):
-                        value = statement.expression.value
-                        if isinstance(value, javalang.tree.ClassCreator):
-                            field_type = value.type.name
-                            if field_type in self.classes and field_type != class_node.name:
-                                associated_class = self.classes[field_type]
-                                if class_node.name in associated_class.associations:
-                                    if (class_node.name, field_type) not in bidirectional_associations:
-                                        bidirectional_associations.append((class_node.name, field_type))
-
-        # Check for bidirectional associations in method invocations (if one class calls a method on another class)
-        for member in class_node.body:
-            if isinstance(member, javalang.tree.MethodDeclaration):
-                for statement in member.body or []:
-                    if isinstance(statement, javalang.tree.StatementExpression) and isinstance(statement.expression, javalang.tree.MethodInvocation):
-                        qualifier = statement.expression.qualifier
-                        if qualifier and qualifier in self.classes:
-                            called_class = self.classes[qualifier]
-                            if class_node.name in called_class.associations:
-                                if (class_node.name, qualifier) not in bidirectional_associations:
-                                    bidirectional_associations.append((class_node.name, qualifier))
-
+    def _extract_bidirectional_associations(self, class_name: str, candidates: Iterable[Optional[str]], relationships: Relationships) -> None:
+        """
+        Records the bidirectional associations of a class, as the names of the classes it is associated with both ways.
+        Each pair is only recorded on one of its two classes, the first one checked, so it is drawn once.
+        The peer's association to the class is removed, so the pair isn't drawn a second time as a plain association.
+        Two classes aren't paired if either one has a relationship with the other that ranks above a bidirectional
+        association (e.g., a composition), as that relationship is the one drawn.
+        :param candidates: The classes the class references, gathered while its relationships were extracted,
+                           each listed once in the order they were found.
+        :param relationships: The relationships of the class, whose bidirectional associations are filled.
+        """
+        # The reverse lookups go through the association index, which holds every discovered class's associations up front
+        associations_of = self._assoc_index.get
+        priority_order = JavaProjectParser.DEFAULT_PRIORITY_ORDER
+        outranking = priority_order[:priority_order.index(BIDIRECTIONAL_ASSOCIATION)]
+        bidirectional_associations = relationships[BIDIRECTIONAL_ASSOCIATION]
+
+        for other_name in candidates:
+            # If the associated class also has a reference to this class, it's bidirectional
+            if other_name and other_name != class_name and class_name in associations_of(other_name, ()):
+                other_relationships = self._relationships_index[other_name]
+                if any(other_name in relationships[index] or class_name in other_relationships[index] for index in outranking):
+                    continue
+                bidirectional_associations.append(other_name)
+                # Both directions are taken out of the pair, so the peer doesn't find it again and neither draws an association
+                other_relationships[ASSOCIATION].remove(class_name)
+                self._assoc_index[class_name].discard(other_name)
+
+
+
+# PlantUML arrows of the relation lines, with their surrounding spaces
+ARROW_EXTENDS: Final = " <|-- "
+ARROW_IMPLEMENTS: Final = " <|.. "
+ARROW_DEPENDENCY: Final = " ..> "
+ARROW_AGGREGATION: Final = " o-- "
+ARROW_COMPOSITION: Final = " *-- "
+ARROW_ASSOCIATION: Final = " -- "
+ARROW_BIDIRECTIONAL: Final = " <--> "
 
 
 class PlantUMLGenerator:
     """Generates PlantUML code from Java class data, grouped by package."""
+    # JavaClass attribute holding each kind of relation, its PlantUML arrow, and whether the mate is written first
+    _REL_TABLE: ClassVar[Tuple[Tuple[str, str, bool], ...]] = (
+        ("extends", ARROW_EXTENDS, True),
+        ("implements", ARROW_IMPLEMENTS, True),
+        ("dependencies", ARROW_DEPENDENCY, False),
+        ("aggregations", ARROW_AGGREGATION, False),
+        ("compositions", ARROW_COMPOSITION, False),
+        ("associations", ARROW_ASSOCIATION, False),
+        ("bidirectional_associations", ARROW_BIDIRECTIONAL, False),
+        ("reflexive_associations", ARROW_ASSOCIATION, False),
+    )
+
     def __init__(self, packages: Dict[str, JavaPackage]):
         self.packages = packages
 
     def generate(self) -> str:
         """Generates PlantUML diagram code for all packages and their classes."""
-        uml = ["@startuml"]
+        return "\n".join(self.generate_lines())
+
+    def generate_lines(self) -> Iterator[str]:
+        """
+        Generates the PlantUML diagram code line by line, so it can be streamed to a file
+        without holding the whole diagram in memory.
+        """
+        yield "@startuml"
 
         # Generating the package definitions
         for package_name, java_package in self.packages.items():
-            uml.append(f"package {package_name} {{")
+            yield from self._package_lines(package_name, java_package)
+
+        # Generating relationships
+        yield from self._relation_lines(self.packages.values())
+
+        yield "@enduml"
+
+    def write(self, file: TextIO, lines_per_write: int = 1024) -> None:
+        """
+        Streams the PlantUML diagram code to an open text file.
+        The lines are joined in blocks, so the file gets a few large writes instead of one small write per line,
+        while only a block is ever held in memory.
+        :param file: The file the code is written to.
+        :param lines_per_write: The number of lines joined into each write.
+        """
+        lines = self.generate_lines()
+        while True:
+            block = list(islice(lines, lines_per_write))
+            if not block:
+                break
+            file.write("\n".join(block))
+            file.write("\n")
+
+    def generate_per_package(self) -> Dict[str, str]:
+        """
+        Generates one PlantUML diagram code per package, each holding the package definitions
+        and the relationships starting from its classes.
+        :return: The PlantUML code of each package, by package name.
+        """
+        diagrams = {}
+        for package_name, java_package in self.packages.items():
+            # Joined straight from the line generators, without building an intermediate list first
+            diagrams[package_name] = "\n".join(chain(("@startuml",), self._package_lines(package_name, java_package),
+                                                     self._relation_lines([java_package]), ("@enduml",)))
+        return diagrams
+
+    def _package_lines(self, package_name: str, java_package: JavaPackage) -> Iterator[str]:
+        """Generates the definition of a package and of its classes, interfaces and enums."""
+        yield f"package {package_name} {{"
+        # Method names and signatures are formatted straight from the two views of the methods dict, in the same order
+        format_method = self._format_method
+        
+        # Generating the class definitions inside each package
+        for cls in java_package.classes.values():
+            yield f" class {cls.name} {{"
             
-            # Generating the class definitions inside each package
-            for cls in java_package.classes:
-                uml.append(f" class {cls.name} {{")
-                
-                # Adding attributes with visibility
-                for attr, visibility in cls.attributes.items():
-                    uml.append(f"  {visibility} {attr}")
-                
-                # Adding methods with visibility, return type, and parameters
-                for method, signature in cls.methods.items():
-                    visibility = signature.get("visibility", "+")  # Default to public if no visibility
-                    return_type = signature.get("return_type", "void")
-                    parameters = ", ".join(signature.get("parameters", []))
-                    uml.append(f"  {visibility} {return_type} {method}({parameters})")
-                
-                uml.append(" }")  # End class definition
+            # Adding attributes with visibility
+            for attr, visibility in cls.attributes.items():
+                yield f"  {visibility} {attr}"
             
-            # Generating the interface definitions inside each package
-            for iface in java_package.interfaces:
-                uml.append(f" interface {iface.name} {{")
-                
-                # Adding methods with visibility, return type, and parameters for interfaces
-                for method, signature in iface.methods.items():
-                    visibility = signature.get("visibility", "+")  # Default to public if no visibility
-                    return_type = signature.get("return_type", "void")
-                    parameters = ", ".join(signature.get("parameters", []))
-                    uml.append(f"  {visibility} {return_type} {method}({parameters})")
-                
-                uml.append(" }")  # End interface definition
-
-            # Generating the enum definitions inside each package
-            for enum in java_package.enums:
-                uml.append(f" enum {enum.name} {{")
-                
-                # Adding enum constants
-                for constant in enum.constants:
-                    uml.append(f"  {constant}")
-                
-                uml.append(" }")  # End enum definition
-
-            uml.append(" }")  # End package definition
+            # Adding methods with visibility, return type, and parameters
+            yield from map(format_method, cls.methods, cls.methods.values())
+            
+            yield " }"  # End class definition
+        
+        # Generating the interface definitions inside each package
+        for iface in java_package.interfaces.values():
+            yield f" interface {iface.name} {{"
+            
+            # Adding methods with visibility, return type, and parameters for interfaces
+            yield from map(format_method, iface.methods, iface.methods.values())
+            
+            yield " }"  # End interface definition
 
-        # Fix to prevent duplicated relations.
-        relations: set[str] = set()
+        # Generating the enum definitions inside each package
+        for enum in java_package.enums.values():
+            yield f" enum {enum.name} {{"
+            
+            # Adding enum constants
+            for constant in enum.constants:
+                yield f"  {constant}"
+            
+            yield " }"  # End enum definition
 
-        def add_relation(relation: str):
-            if relation not in relations:
-                uml.append(relation)
-                relations.add(relation)
+        yield " }"  # End package definition
 
-        # Generating relationships
-        for java_package in self.packages.values():
-            for cls in java_package.classes:
-                if cls.extends:
-                    add_relation(f"{cls.extends} <|-- {cls.name}")
-                for impl in cls.implements:
-                    add_relation(f"{impl} <|.. {cls.name}")
-                for dep in cls.dependencies:
-                    add_relation(f"{cls.name} ..> {dep}")
-                for agg in cls.aggregations:
-                    add_relation(f"{cls.name} o-- {agg}")
-                for comp in cls.compositions:
-                    add_relation(f"{cls.name} *-- {comp}")
-                for assoc in cls.associations:
-                    add_relation(f"{cls.name} -- {assoc}")
-                for bidir in cls.bidirectional_associations:
-                    add_relation(f"{cls.name} <--> {bidir}")
-                for reflexive in cls.reflexive_associations:
-                    add_relation(f"{cls.name} -- {reflexive}")
-        
+    @staticmethod
+    def _format_method(method: str, signature: MethodSig) -> str:
+        """Formats a method line with its visibility, return type, and parameters."""
+        visibility, return_type, parameters = signature
+        return f"  {visibility} {return_type} {method}({', '.join(parameters)})"
 
-        uml.append("@enduml")
-        return "\n".join(uml)
+    def _relation_lines(self, java_packages: Iterable[JavaPackage]) -> Iterator[str]:
+        """
+        Generates the relationships starting from the classes of the given packages.
+        The parser gives each class relationship lists holding every mate once, and never the class itself
+        outside the reflexive associations, so the lines of a class are already distinct.
+        """
+        classes = [cls for java_package in java_packages for cls in java_package.classes.values()]
+        name_counts: Dict[str, int] = defaultdict(int)
+        for cls in classes:
+            name_counts[cls.name] += 1
+        # Fix to prevent duplicated relations.
+        # Only classes sharing their name with a class of another package can repeat a line, so only their
+        # relations are deduplicated, on their (left, arrow, right) parts.
+        relations: Set[Tuple[Any, str, Any]] = set()
+        add_relation = relations.add
+        rel_table = PlantUMLGenerator._REL_TABLE
+
+        for cls in classes:
+            name = cls.name
+            shared_name = name_counts[name] > 1
+            for attr, arrow, mate_first in rel_table:
+                mates = getattr(cls, attr)
+                if isinstance(mates, str):
+                    mates = (mates,)
+                elif not mates:
+                    continue
+                for mate in mates:
+                    left, right = (mate, name) if mate_first else (name, mate)
+                    if shared_name:
+                        relation = (left, arrow, right)
+                        if relation in relations:
+                            continue
+                        add_relation(relation)
+                    yield f"{left}{arrow}{right}"
+
+
+
+
+class LocalPlantUMLRenderer:
+    """Renders PlantUML code with a local plantuml.jar in pipe mode, without any server round-trip."""
+    # Printed by PlantUML after each image, to split the output of a batch
+    DELIMITER: ClassVar[bytes] = b"__JAVA_UML_ANALYSER_END_OF_DIAGRAM__"
+
+    def __init__(self, jar_path: str = "plantuml.jar", output_format: str = "png"):
+        """
+        :param jar_path: The path of the PlantUML jar.
+        :param output_format: The image format generated by PlantUML (e.g., 'png', 'svg').
+        """
+        self.jar_path = jar_path
+        self.output_format = output_format
+
+    @staticmethod
+    def is_available(jar_path: Optional[str]) -> bool:
+        """Checks if the jar exists and Java can be found to run it."""
+        return jar_path is not None and os.path.isfile(jar_path) and shutil.which("java") is not None
 
+    def processes(self, plantuml_code: str) -> bytes:
+        """Renders a single diagram and returns the raw image data, like PlantUML.processes."""
+        return self.processes_batch([plantuml_code])[0]
 
+    def processes_batch(self, plantuml_codes: List[str]) -> List[bytes]:
+        """
+        Renders several diagrams with a single Java process, so the JVM only starts once per batch.
+        :param plantuml_codes: The PlantUML code of each diagram.
+        :return: The raw image data of each diagram, in the same order.
+        """
+        command = ["java", "-jar", self.jar_path, "-pipe", f"-t{self.output_format}", "-charset", "UTF-8",
+                   "-pipedelimitor", self.DELIMITER.decode()]
+        result = subprocess.run(command, input="\n".join(plantuml_codes).encode("utf-8"), capture_output=True)
+
+        # Each image is followed by the delimiter and a line break
+        images = [image.lstrip(b"\r\n") for image in result.stdout.split(self.DELIMITER)][:len(plantuml_codes)]
+        if result.returncode != 0 or len(images) < len(plantuml_codes):
+            raise RuntimeError(f"PlantUML exited with code {result.returncode}: {result.stderr.decode('utf-8', errors='replace').strip()}")
+        return images
 
 
 class PlantUMLDiagram:
-    def __init__(self, plantuml_code: str, output_file: str, server_url: str = 'http://www.plantuml.com/plantuml/img/'):
+    def __init__(self, plantuml_code: str, output_file: str, server_url: str = 'http://www.plantuml.com/plantuml/img/',
+                 package_diagrams: Optional[Dict[str, str]] = None, max_workers: int = 8, batch_size: int = 48,
+                 plantuml_jar: Optional[str] = None):
         """
         Initializes the PlantUMLDiagram instance.
 
         :param plantuml_code: The PlantUML code as a string.
         :param output_file: The desired output file name (e.g., 'diagram.png').
         :param server_url: The URL of the PlantUML server (default is the public server).
+        :param package_diagrams: (Optional) The PlantUML code of each package. When given, one diagram is
+                                 rendered per package (e.g., 'diagram_mypackage.png') instead of a single one.
+        :param max_workers: The number of package diagrams sent to the server (or local Java processes) at the same time.
+        :param batch_size: The number of package diagrams dispatched together, so huge projects don't queue
+                           every request at once. With a local jar, each batch is rendered by a single Java process.
+        :param plantuml_jar: (Optional) The path of a local plantuml.jar. When it exists and Java is installed,
+                             diagrams are rendered locally and the server is not used.
         """
         self.plantuml_code = plantuml_code
         self.output_file = output_file
         self.server_url = server_url
-        self.plantuml = PlantUML(url=self.server_url)
+
+        # Ensure the output directory exists, once for all the diagrams saved next to the output file
+        output_folder = os.path.dirname(output_file)
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+
+        self.plantuml: Any
+        if LocalPlantUMLRenderer.is_available(plantuml_jar):
+            self.plantuml = LocalPlantUMLRenderer(cast(str, plantuml_jar))
+        else:
+            self.plantuml = PlantUML(url=self.server_url)
+        self.package_diagrams = package_diagrams
+        self.max_workers = max_workers
+        self.batch_size = batch_size
 
     def generate_diagram(self):
         """
-        Generates the UML diagram by sending the PlantUML code to the server.
+        Generates the UML diagram by sending the PlantUML code to the server, or to the local PlantUML jar.
         Saves the diagram to the specified output file.
         """
+        if self.package_diagrams:
+            self.generate_package_diagrams()
+            return
+
         try:
             # Process the PlantUML code and retrieve the diagram
             diagram_data = self.plantuml.processes(self.plantuml_code)
-
-            # Ensure the output directory exists
-            os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
-
-            # Write the diagram data to the output file
-            with open(self.output_file, 'wb') as file:
-                file.write(diagram_data)
-            print(f"Diagram successfully generated and saved to {self.output_file}")
+            self._save_diagram(self.output_file, diagram_data)
         except Exception as e:
             print(f"An error occurred while generating the diagram: {e}")
 
+    def generate_package_diagrams(self):
+        """
+        Generates one UML diagram per package, rendering them concurrently.
+        Each diagram is saved next to the output file, suffixed with its package name.
+        """
+        if not self.package_diagrams:
+            return
+        root, extension = os.path.splitext(self.output_file)
+        items = list(self.package_diagrams.items())
+        batches = [items[start:start + self.batch_size] for start in range(0, len(items), self.batch_size)]
+
+        # Rendering is bound by the server round-trips or the Java processes, so threads are enough to overlap them
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if isinstance(self.plantuml, LocalPlantUMLRenderer):
+                # Each batch is rendered by a single Java process, so the JVM only starts once per batch
+                batch_futures = [executor.submit(self.plantuml.processes_batch, [code for _, code in batch]) for batch in batches]
+                for batch, batch_future in zip(batches, batch_futures):
+                    try:
+                        images = batch_future.result()
+                    except Exception as e:
+                        for package_name, _ in batch:
+                            print(f"An error occurred while generating the diagram of package {package_name}: {e}")
+                        continue
+                    for (package_name, _), diagram_data in zip(batch, images):
+                        try:
+                            self._save_diagram(f"{root}_{package_name}{extension}", diagram_data)
+                        except Exception as e:
+                            print(f"An error occurred while generating the diagram of package {package_name}: {e}")
+                return
+
+            for batch in batches:
+                futures = [executor.submit(self.plantuml.processes, code) for _, code in batch]
+                for (package_name, _), future in zip(batch, futures):
+                    try:
+                        self._save_diagram(f"{root}_{package_name}{extension}", future.result())
+                    except Exception as e:
+                        print(f"An error occurred while generating the diagram of package {package_name}: {e}")
+
+    def _save_diagram(self, output_file: str, diagram_data: bytes) -> None:
+        """Writes the diagram data to the output file."""
+        # Write the diagram data to the output file
+        with open(output_file, 'wb') as file:
+            file.write(diagram_data)
+        print(f"Diagram successfully generated and saved to {output_file}")
+
+@lru_cache(maxsize=8)
+def _read_config(config_file_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Reads a JSON configuration file, cached until its modification time changes."""
+    # json detects the UTF-8 encoding of the raw bytes itself, so no text wrapper is needed
+    return json.loads(Path(config_file_path).read_bytes())
+
+
 class ConfigLoader:
     def __init__(self, config_file_path):
         self.config_file_path = config_file_path
@@ -781,8 +1275,7 @@ class ConfigLoader:
         Loads the configuration from the provided JSON file.
         """
         try:
-            with open(self.config_file_path, "r", encoding="utf-8") as config_file:
-                return json.load(config_file)
+            return _read_config(self.config_file_path, os.stat(self.config_file_path).st_mtime_ns)
         except Exception as e:
             print(f"Error loading configuration: {e}")
             return {}
@@ -805,6 +1298,24 @@ class ConfigLoader:
         """
         return self.config.get("output_uml_diagram", "project_diagram.png")
 
+    def get_cache_folder(self):
+        """
+        Returns the folder used to cache parsed Java files from the loaded configuration.
+        """
+        return self.config.get("cache_folder", ".uml_cache")
+
+    def get_split_by_package(self):
+        """
+        Returns whether one UML diagram is generated per package from the loaded configuration.
+        """
+        return self.config.get("split_by_package", False)
+
+    def get_plantuml_jar(self):
+        """
+        Returns the path of the local PlantUML jar from the loaded configuration.
+        """
+        return self.config.get("plantuml_jar", "plantuml.jar")
+
 
 def main() -> None:
     # Load configuration
@@ -812,18 +1323,32 @@ def main() -> None:
     project_folder = config_loader.get_project_folder()
     output_uml = config_loader.get_output_uml_code()
     output_diagram = config_loader.get_output_uml_diagram()
+    cache_folder = config_loader.get_cache_folder()
+    split_by_package = config_loader.get_split_by_package()
+    plantuml_jar = config_loader.get_plantuml_jar()
 
-    parser = JavaProjectParser(project_folder)
+    parser = JavaProjectParser(project_folder, cache_folder=cache_folder)
     parser.parse()
 
     generator = PlantUMLGenerator(parser.packages)
-    plantuml_code = generator.generate()
 
     with open(output_uml, "w", encoding="utf-8") as file:
-        file.write(plantuml_code)
+        if split_by_package:
+            # Only the package diagrams are rendered, so the whole code is streamed to the file, in blocks of lines
+            plantuml_code = ""
+            generator.write(file)
+        else:
+            # The whole code is rendered as a single diagram, so it is kept in memory instead of being read back from the file
+            plantuml_code = generator.generate()
+            file.write(plantuml_code)
+            file.write("\n")
+
+    # Large projects can be rendered as one diagram per package, sent to the server concurrently
+    package_diagrams = generator.generate_per_package() if split_by_package else None
 
     # Create an instance of PlantUMLDiagram
-    diagram = PlantUMLDiagram(plantuml_code=plantuml_code, output_file=output_diagram)
+    diagram = PlantUMLDiagram(plantuml_code=plantuml_code, output_file=output_diagram, package_diagrams=package_diagrams,
+                              plantuml_jar=plantuml_jar)
 
     # Generate the diagram
     diagram.generate_diagram()